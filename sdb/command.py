@@ -24,7 +24,7 @@ registered commands during a session.
 import argparse
 import inspect
 import textwrap
-from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Type, TypeVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Type, TypeVar
 
 import drgn
 
@@ -40,6 +40,7 @@ from sdb import target
 #
 all_commands: Set[Type["Command"]] = set({})
 registered_commands: Dict[str, Type["Command"]] = {}
+command_parsers: Dict[Tuple[Type["Command"], str], argparse.ArgumentParser] = {}
 
 
 def add_command(class_: Type["Command"]) -> None:
@@ -158,7 +159,7 @@ class Command:
         the class is used to populate the contents of the message.
         """
         # pylint: disable=too-many-branches
-        parser = cls._init_parser(name)
+        parser = cls._get_parser(name)
 
         print("SUMMARY")
         for i, line in enumerate(parser.format_help().split('\n')):
@@ -230,10 +231,7 @@ class Command:
                     f" case it will consume no objects as input; instead it"
                     f" will locate all objects of type '{cls.output_type}',"
                     f" and emit them as output.")
-            types = []
-            for (_, method) in inspect.getmembers(cls, inspect.isroutine):
-                if hasattr(method, "input_typename_handled"):
-                    types.append(method.input_typename_handled)
+            types = list(cls.input_handler_names)
             if len(types) != 0:
                 loc_text += (
                     f" Input of the following types is also accepted,"
@@ -282,6 +280,23 @@ class Command:
 
     input_type: Optional[str] = None
 
+    @classmethod
+    def _get_parser(cls, name: str) -> argparse.ArgumentParser:
+        """
+        Return the argument parser of this command for the given name.
+
+        Building an argparse.ArgumentParser is not cheap and a new
+        command object is created every time a command is invoked, so
+        we build each parser once and reuse it from then on. This is
+        safe as parsers are never modified after _init_parser().
+        """
+        key = (cls, name)
+        parser = command_parsers.get(key)
+        if parser is None:
+            parser = cls._init_parser(name)
+            command_parsers[key] = parser
+        return parser
+
     def __init__(self,
                  args: Optional[List[str]] = None,
                  name: str = "_") -> None:
@@ -289,7 +304,7 @@ class Command:
         self.isfirst = False
         self.islast = False
 
-        self.parser = type(self)._init_parser(name)
+        self.parser = type(self)._get_parser(name)
 
         #
         # The if-else clauses below may seem like it can be avoided by:
@@ -561,10 +576,61 @@ class Locator(Command):
 
     output_type: Optional[str] = None
 
+    #
+    # The names of the methods decorated with InputHandler keyed by the
+    # name of the type that they handle. This is filled in for each
+    # subclass when it is defined. See __init_subclass__().
+    #
+    input_handler_names: Dict[str, str] = {}
+
+    #
+    # The input handlers of this instance keyed by the canonical name of
+    # the type that they handle. See input_handlers().
+    #
+    _input_handlers: Optional[Dict[str, Callable[[drgn.Object],
+                                                 Iterable[drgn.Object]]]] = None
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """
+        Besides registering the command (see Command.__init_subclass__),
+        record which of the subclass's methods are input handlers, so
+        we don't have to go through all of its attributes whenever the
+        locator is used.
+        """
+        super().__init_subclass__(**kwargs)
+        handler_names = {}
+        for attr in dir(cls):
+            func = inspect.getattr_static(cls, attr)
+            if not inspect.isfunction(func):
+                continue
+            typename = getattr(func, "input_typename_handled", None)
+            if typename is not None:
+                handler_names[typename] = attr
+        cls.input_handler_names = handler_names
+
     def no_input(self) -> Iterable[drgn.Object]:
         # pylint: disable=missing-docstring
         raise CommandError(self.name, 'command requires an input')
 
+    def input_handlers(
+            self) -> Dict[str, Callable[[drgn.Object], Iterable[drgn.Object]]]:
+        """
+        Returns the methods of this locator that were decorated with
+        InputHandler, keyed by the canonical name of their input type.
+
+        Canonicalizing the type names requires the target, so the table
+        is built the first time it is needed rather than when the class
+        is defined. This matters for locators that are invoked over and
+        over again by other commands (e.g. metaslab for each vdev
+        printed by vdev).
+        """
+        if self._input_handlers is None:
+            self._input_handlers = {
+                type_canonicalize_name(typename): getattr(self, attr)
+                for typename, attr in self.input_handler_names.items()
+            }
+        return self._input_handlers
+
     def caller(self, objs: Iterable[drgn.Object]) -> Iterable[drgn.Object]:
         """
         This method will dispatch to the appropriate instance function
@@ -572,14 +638,16 @@ class Locator(Command):
         """
 
         out_type = None
+        out_type_name = None
         if self.output_type is not None:
             out_type = target.get_type(self.output_type)
-        baked = {}
-        for (_, method) in inspect.getmembers(self, inspect.ismethod):
-            if not hasattr(method, "input_typename_handled"):
-                continue
-            baked[type_canonicalize_name(
-                method.input_typename_handled)] = method
+            out_type_name = type_canonical_name(out_type)
+        baked = self.input_handlers()
+        #
+        # Walk doesn't keep any state between inputs, so a single
+        # instance is shared by all the objects that need to be walked.
+        #
+        walker: Optional[Walk] = None
 
         if self.isfirst:
             assert not objs
@@ -597,15 +665,17 @@ class Locator(Command):
 
             # try passthrough of output type
             # note, this may also be handled by subclass-specified input types
-            if obj_type_name == type_canonical_name(out_type):
+            if obj_type_name == out_type_name:
                 yield i
                 continue
 
             # try walkers
             if out_type is not None:
+                if walker is None:
+                    walker = Walk()
                 try:
                     # pylint: disable=protected-access
-                    for obj in Walk()._call([i]):
+                    for obj in walker._call([i]):
                         yield drgn.cast(out_type, obj)
                     continue
                 except CommandError:
@@ -23,11 +23,11 @@ import drgn
 import sdb
 from sdb.commands.zfs.internal import (
     BP_GET_TYPE, BP_GET_CHECKSUM, BP_GET_COMPRESS, BP_GET_LEVEL, BP_GET_LSIZE,
-    BP_GET_BIRTH, BP_GET_PSIZE, BP_LOGICAL_BIRTH, BP_IS_HOLE, BP_GET_NDVAS,
-    BP_IS_ENCRYPTED, BP_IS_GANG, BP_GET_LAYER, BP_IS_AUTHENTICATED,
-    BP_HAS_INDIRECT_MAC_CKSUM, BP_GET_BYTEORDER, BP_GET_DEDUP, BP_IS_EMBEDDED,
-    BP_IS_REDACTED, BP_GET_FILL, BP_GET_IV2, DVA_IS_VALID, DVA_GET_VDEV,
-    DVA_GET_OFFSET, DVA_GET_ASIZE, BPE_GET_ETYPE)
+    BP_GET_BIRTH, BP_GET_PSIZE, BP_LOGICAL_BIRTH, BP_GET_NDVAS, BP_IS_ENCRYPTED,
+    BP_IS_GANG, BP_GET_LAYER, BP_IS_AUTHENTICATED, BP_HAS_INDIRECT_MAC_CKSUM,
+    BP_GET_BYTEORDER, BP_GET_DEDUP, BP_IS_EMBEDDED, BP_IS_REDACTED, BP_GET_FILL,
+    BP_GET_IV2, DVA_IS_VALID, DVA_GET_VDEV, DVA_GET_OFFSET, DVA_GET_ASIZE,
+    DVA_IS_EMPTY, BPE_GET_ETYPE)
 
 
 class Blkptr(sdb.PrettyPrinter):
@@ -117,9 +117,23 @@ class Blkptr(sdb.PrettyPrinter):
                 print("<NULL>")
                 continue
 
-            if BP_IS_HOLE(bp):
+            #
+            # Every field of the block pointer is decoded at least
+            # once below, most of them more than once. Read the whole
+            # structure from the target upfront so all these accesses
+            # are served from a local copy.
+            #
+            bp = bp[0].read_()
+
+            #
+            # Decode the embedded bit once and check for a hole
+            # directly, rather than through BP_IS_HOLE() which would
+            # decode that bit again.
+            #
+            embedded = BP_IS_EMBEDDED(bp)
+            if not embedded and DVA_IS_EMPTY(bp.blk_dva[0]):
                 self.print_hole(bp)
-            elif BP_IS_EMBEDDED(bp):
+            elif embedded:
                 self.print_embedded(bp)
             elif BP_IS_REDACTED(bp):
                 self.print_redacted(bp)
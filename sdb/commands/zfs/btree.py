@@ -58,6 +58,7 @@ class Btree(sdb.Walker):
                  name: str = "_") -> None:
         super().__init__(args, name)
         self.elem_size: drgn.Object = None
+        self.has_bth_first = False
 
     def _val(self, start: int, idx: int) -> drgn.Object:
         location = start + (self.elem_size * idx)
@@ -67,14 +68,10 @@ class Btree(sdb.Walker):
         if not node:
             return
 
-        #
-        # We check both members of the node because of the change introdcued in
-        # https://github.com/delphix/zfs/commit/c0bf952c846100750f526c2a32ebec17694a201b
-        #
-        try:
+        if self.has_bth_first:
             bth_first = node.bth_first
             recurse = int(bth_first) == -1
-        except AttributeError:
+        else:
             bth_first = 0
             recurse = node.bth_core
 
@@ -95,4 +92,14 @@ class Btree(sdb.Walker):
 
     def walk(self, obj: drgn.Object) -> Iterable[drgn.Object]:
         self.elem_size = obj.bt_elem_size
+        #
+        # We check both members of the node because of the change introdcued in
+        # https://github.com/delphix/zfs/commit/c0bf952c846100750f526c2a32ebec17694a201b
+        #
+        # All the nodes share the same header type, so figure out which
+        # one we're dealing with once rather than catching an
+        # AttributeError for every node.
+        #
+        hdr_type = sdb.type_canonicalize(obj.bt_root.type_.type)
+        self.has_bth_first = hdr_type.has_member("bth_first")
         yield from self._helper(obj.bt_root)
@@ -17,10 +17,16 @@
 # pylint: disable=missing-docstring
 
 import argparse
-from typing import Iterable
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import drgn
 import sdb
+from sdb.commands.zfs.internal import read_array
+
+#
+# Number of dbuf hash table buckets read from the target at a time.
+#
+HASH_TABLE_BATCH = 4096
 
 
 class Dbuf(sdb.Locator, sdb.PrettyPrinter):
@@ -57,13 +63,20 @@ class Dbuf(sdb.Locator, sdb.PrettyPrinter):
                             help='filter: only dbufs that have nonzero holds')
         return parser
 
+    def __init__(self,
+                 args: Optional[List[str]] = None,
+                 name: str = "_") -> None:
+        super().__init__(args, name)
+        self.objset_names: Dict[int, str] = {}
+        self.filters = self._init_filters()
+
     @staticmethod
     def DslDirName(dd: drgn.Object) -> str:
-        name = ""
-        if dd.dd_parent:
-            name = Dbuf.DslDirName(dd.dd_parent) + "/"
-        name += dd.dd_myname.string_().decode("utf-8")
-        return name
+        names = []
+        while dd:
+            names.append(dd.dd_myname.string_().decode("utf-8"))
+            dd = dd.dd_parent
+        return "/".join(reversed(names))
 
     @staticmethod
     def DatasetName(ds: drgn.Object) -> str:
@@ -82,36 +95,127 @@ class Dbuf(sdb.Locator, sdb.PrettyPrinter):
             return f'{spa_name}/_MOS'
         return Dbuf.DatasetName(os.os_dsl_dataset)
 
+    def objset_name(self, os: drgn.Object) -> str:
+        #
+        # Most dbufs belong to a handful of objsets, so remember the
+        # names that we've already built for the lifetime of this
+        # command instead of walking the DSL directory hierarchy for
+        # every single dbuf.
+        #
+        addr = int(os)
+        name = self.objset_names.get(addr)
+        if name is None:
+            name = Dbuf.ObjsetName(os)
+            self.objset_names[addr] = name
+        return name
+
     def pretty_print(self, objs: drgn.Object) -> None:
         print(
             f"{'addr':>20} {'object':>8} {'lvl':>4} {'blkid':>8} {'holds':>5} os"
         )
-        for dbuf in filter(self.argfilter, objs):
+        for dbuf in objs:
             entry = (f"{hex(dbuf):>20}"
                      f" {int(dbuf.db.db_object):>8d}"
                      f" {int(dbuf.db_level):>4d}"
                      f" {int(dbuf.db_blkid):>8d}"
                      f" {int(dbuf.db_holds.rc_count):>5d}"
-                     f" {Dbuf.ObjsetName(dbuf.db_objset)}")
+                     f" {self.objset_name(dbuf.db_objset)}")
             print(entry)
 
-    def argfilter(self, db: drgn.Object) -> bool:
-        # self.args.object (and friends) may be set to 0, indicating a search
-        # for object 0 (the meta-dnode). Therefore we need to check
-        # `is not None` rather than just the truthiness of self.args.object.
-        if self.args.object is not None and db.db.db_object != self.args.object:
-            return False
-        if self.args.level is not None and db.db_level != self.args.level:
-            return False
-        if self.args.blkid is not None and db.db_blkid != self.args.blkid:
-            return False
-        if self.args.has_holds and db.db_holds.rc_count == 0:
-            return False
-        if self.args.dataset is not None and Dbuf.ObjsetName(
-                db.db_objset) != self.args.dataset:
-            return False
+    @staticmethod
+    def member_reader(member: str) -> Tuple[Callable[[int], int], int]:
+        """
+        Returns a function that reads the given (integer) member of
+        the dmu_buf_impl_t at some address straight from the target,
+        without creating any drgn objects along the way, together with
+        the size of the member in bytes.
+        """
+        prog = sdb.get_prog()
+        dbuf_type = sdb.get_type("dmu_buf_impl_t")
+        offset = drgn.offsetof(dbuf_type, member)
+        #
+        # A reference object at address zero lets drgn resolve the type
+        # of nested members (e.g. "db.db_object") without reading any
+        # memory.
+        #
+        field = drgn.Object(prog, dbuf_type, address=0)
+        for name in member.split("."):
+            field = field.member_(name)
+        size = sdb.type_canonicalize_size(field.type_)
+        read = {
+            1: prog.read_u8,
+            2: prog.read_u16,
+            4: prog.read_u32,
+            8: prog.read_u64,
+        }[size]
+        return (lambda addr: read(addr + offset)), size
+
+    @staticmethod
+    def member_equals(member: str, value: int) -> Callable[[int], bool]:
+        """
+        Returns a function that checks whether the given (unsigned
+        integer) member of the dmu_buf_impl_t at some address is equal
+        to `value`.
+
+        The raw reads give us unsigned values, so we mimic the C
+        comparison that we'd get from drgn objects: members as wide as
+        an int or wider are compared as unsigned, which lets e.g.
+        "-b -1" match DMU_BONUS_BLKID (-1ULL). Narrower members are
+        promoted to int and never match a negative value.
+        """
+        read, size = Dbuf.member_reader(member)
+        if size >= 4:
+            value &= (1 << (8 * size)) - 1
+        return lambda addr: read(addr) == value
+
+    def _init_filters(self) -> List[Callable[[int], bool]]:
+        #
+        # Only keep the checks that the user actually asked for so
+        # addrfilter() doesn't have to look at every argument for every
+        # single dbuf. The checks are ordered from cheapest to most
+        # expensive, the dataset name being built by walking up the
+        # DSL directory hierarchy of the dbuf's objset.
+        #
+        # All checks but the dataset one work on the raw address of
+        # the dbuf and read their field at its offset, which is a lot
+        # cheaper than going through drgn's member lookup.
+        #
+        # Note that self.args.object (and friends) may be set to 0,
+        # indicating a search for object 0 (the meta-dnode). Therefore
+        # we need to check `is not None` rather than just the truthiness
+        # of self.args.object.
+        #
+        filters: List[Callable[[int], bool]] = []
+        obj, level, blkid = self.args.object, self.args.level, self.args.blkid
+        if obj is not None:
+            filters.append(Dbuf.member_equals("db.db_object", obj))
+        if level is not None:
+            filters.append(Dbuf.member_equals("db_level", level))
+        if blkid is not None:
+            filters.append(Dbuf.member_equals("db_blkid", blkid))
+        if self.args.has_holds:
+            read_holds, _ = Dbuf.member_reader("db_holds.rc_count")
+            filters.append(lambda addr: read_holds(addr) != 0)
+        dataset = self.args.dataset
+        if dataset is not None:
+            read_objset, _ = Dbuf.member_reader("db_objset")
+
+            def in_dataset(addr: int) -> bool:
+                objset = sdb.create_object("objset_t *", read_objset(addr))
+                return self.objset_name(objset) == dataset
+
+            filters.append(in_dataset)
+        return filters
+
+    def addrfilter(self, addr: int) -> bool:
+        for check in self.filters:
+            if not check(addr):
+                return False
         return True
 
+    def argfilter(self, db: drgn.Object) -> bool:
+        return self.addrfilter(int(db))
+
     def all_dnode_dbufs(self, dn: drgn.Object) -> Iterable[drgn.Object]:
         yield from sdb.execute_pipeline(
             [dn.dn_dbufs.address_of_()],
@@ -125,14 +229,52 @@ class Dbuf(sdb.Locator, sdb.PrettyPrinter):
     def from_dbuf(self, dbuf: drgn.Object) -> Iterable[drgn.Object]:
         yield from filter(self.argfilter, [dbuf])
 
+    def caller(self, objs: Iterable[drgn.Object]) -> Iterable[drgn.Object]:
+        #
+        # Our input handlers and no_input() only yield the dbufs that
+        # pass our filters. Dbufs that Locator.caller() reaches through
+        # a walker (e.g. "member dn_dbufs | dbuf -l 0") don't go through
+        # any of them though, so those are filtered here. This way each
+        # dbuf is filtered exactly once.
+        #
+        if self.isfirst:
+            yield from super().caller(objs)
+            return
+        handlers = self.input_handlers()
+        for obj in objs:
+            handler = handlers.get(sdb.type_canonical_name(obj.type_))
+            if handler is not None:
+                yield from handler(obj)
+            else:
+                yield from filter(self.argfilter, super().caller([obj]))
+
     @staticmethod
-    def all_dbufs() -> Iterable[drgn.Object]:
+    def all_dbuf_addrs() -> Iterable[int]:
+        prog = sdb.get_prog()
         hash_map = sdb.get_object("dbuf_hash_table").address_of_()
-        for i in range(hash_map.hash_table_mask):
-            dbuf = hash_map.hash_table[i]
-            while dbuf:
-                yield dbuf
-                dbuf = dbuf.db_hash_next
+        hash_table = hash_map.hash_table
+        nbuckets = int(hash_map.hash_table_mask) + 1
+        next_offset = drgn.offsetof(sdb.get_type("dmu_buf_impl_t"),
+                                    "db_hash_next")
+        #
+        # The hash table can have millions of buckets, most of them
+        # empty, so rather than dereferencing each bucket separately
+        # we read the bucket heads in batches. The hash chains are
+        # then followed using raw addresses, which saves us from
+        # creating a drgn object for every link that we go through.
+        #
+        for start in range(0, nbuckets, HASH_TABLE_BATCH):
+            count = min(HASH_TABLE_BATCH, nbuckets - start)
+            for addr in read_array(hash_table, start, count).value_():
+                while addr:
+                    yield addr
+                    addr = prog.read_word(addr + next_offset)
 
     def no_input(self) -> Iterable[drgn.Object]:
-        yield from filter(self.argfilter, self.all_dbufs())
+        #
+        # Apply our filters to the raw addresses and only create drgn
+        # objects for the dbufs that make it through.
+        #
+        dbuf_type = sdb.get_object("dbuf_hash_table").hash_table.type_.type
+        for addr in filter(self.addrfilter, self.all_dbuf_addrs()):
+            yield sdb.create_object(dbuf_type, addr)
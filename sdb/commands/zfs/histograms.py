@@ -17,7 +17,7 @@
 # pylint: disable=missing-docstring
 
 import argparse
-from typing import Iterable
+from typing import Iterable, List
 
 import drgn
 import sdb
@@ -71,25 +71,48 @@ class ZFSHistogram(sdb.Command):
         return parser
 
     @staticmethod
-    def histogram_median(hist: drgn.Object, offset: int = 0) -> int:
+    def histogram_counts(hist: drgn.Object) -> List[int]:
         """
-        Returns the approximated median of a ZFS histogram.
+        Returns the counts of all the buckets of a ZFS histogram,
+        read from the target in one go.
         """
         canonical_type = sdb.type_canonicalize(hist.type_)
         assert canonical_type.kind == drgn.TypeKind.ARRAY
         assert sdb.type_canonicalize(
             canonical_type.type).kind == drgn.TypeKind.INT
+        return list(hist.value_())
+
+    @staticmethod
+    def histogram_median(hist: drgn.Object, offset: int = 0) -> int:
+        """
+        Returns the approximated median of a ZFS histogram.
+        """
+        return ZFSHistogram.counts_median(ZFSHistogram.histogram_counts(hist),
+                                          offset)
 
-        total_space = 0
-        for (bucket, value) in enumerate(hist):
-            total_space += int(value) << (bucket + offset)
+    @staticmethod
+    def counts_median(counts: List[int], offset: int = 0) -> int:
+        """
+        Returns the approximated median of the histogram whose bucket
+        counts are given.
+        """
+        spaces = [
+            value << (bucket + offset) for (bucket, value) in enumerate(counts)
+        ]
+        total_space = sum(spaces)
 
         if total_space == 0:
             return 0
 
-        space_left, median = total_space / 2, 0
-        for (bucket, value) in enumerate(hist):
-            space_in_bucket = int(value) << (bucket + offset)
+        #
+        # All the math below is done on integers so we don't lose
+        # precision for large pools. To avoid dealing with half of an
+        # odd total space, all the quantities that we compare against
+        # are doubled.
+        #
+        space_left, median = total_space, 0
+        for (bucket, space_in_bucket) in enumerate(spaces):
+            space_in_bucket *= 2
             if space_left <= space_in_bucket:
                 median = 1 << (bucket + offset - 1)
                 #
@@ -98,8 +121,15 @@ class ZFSHistogram(sdb.Command):
                 # number of segments in the bucket and assuming that
                 # they are evenly distributed along the bucket's range.
                 #
-                bucket_fill = space_left / space_in_bucket
-                median += round(median * bucket_fill)
+                # The fill of the bucket is rounded half to even, just
+                # like round() does.
+                #
+                fill, rem = divmod(median * space_left, space_in_bucket)
+                past_half = 2 * rem > space_in_bucket
+                half_to_even = 2 * rem == space_in_bucket and fill % 2 == 1
+                if past_half or half_to_even:
+                    fill += 1
+                median += fill
                 break
             space_left -= space_in_bucket
         return median
@@ -116,40 +146,55 @@ class ZFSHistogram(sdb.Command):
     def print_histogram(hist: drgn.Object,
                         offset: int = 0,
                         indent: int = 0) -> None:
-        canonical_type = sdb.type_canonicalize(hist.type_)
-        assert canonical_type.kind == drgn.TypeKind.ARRAY
-        assert sdb.type_canonicalize(
-            canonical_type.type).kind == drgn.TypeKind.INT
+        counts = ZFSHistogram.histogram_counts(hist)
+        #
+        # Empty histograms are common (e.g. for metaslabs that are
+        # never written to), so check for them upfront, which is cheap.
+        #
+        if not any(counts):
+            print(f'{" " * indent}** No histogram data available **')
+            return
 
+        #
+        # Buckets are visited in increasing order so the first non-empty
+        # bucket is the minimum and the last one seen is the maximum.
+        #
         max_count = 0
-        min_bucket = len(hist) - 1
-        max_bucket = 0
-        for (bucket, value) in enumerate(hist):
-            count = int(value)
-            if bucket < min_bucket and count > 0:
-                min_bucket = bucket
-            if bucket > max_bucket and count > 0:
+        min_bucket = max_bucket = -1
+        for (bucket, count) in enumerate(counts):
+            if count > 0:
+                if min_bucket < 0:
+                    min_bucket = bucket
                 max_bucket = bucket
-            if count > max_count:
-                max_count = count
+                if count > max_count:
+                    max_count = count
 
         HISTOGRAM_WIDTH_MAX = 40
         max_count = max(max_count, HISTOGRAM_WIDTH_MAX)
 
-        if min_bucket > max_bucket:
-            print(f'{" " * indent}** No histogram data available **')
-            return
-
-        print(f'{" " * indent}seg-size   count')
-        print(f'{" " * indent}{"-" * 8}   {"-" * 5}')
-
+        #
+        # Since max_count is at least HISTOGRAM_WIDTH_MAX, no bar can be
+        # longer than that so every bar is a slice of the longest one.
+        # The whole table is then printed in one go.
+        #
+        pad = " " * indent
+        stars = "*" * HISTOGRAM_WIDTH_MAX
+        lines = [f'{pad}seg-size   count', f'{pad}{"-" * 8}   {"-" * 5}']
         for bucket in range(min_bucket, max_bucket + 1):
-            count = int(hist[bucket])
-            stars = round(count * HISTOGRAM_WIDTH_MAX / max_count)
-            print(f'{" " * indent}{fmt.size_nicenum(2**(bucket+offset)):>8}: '
-                  f'{count:>6} {"*" * stars}')
-
-        ZFSHistogram.print_histogram_median(hist, offset, indent)
+            count = counts[bucket]
+            nstars = round(count * HISTOGRAM_WIDTH_MAX / max_count)
+            lines.append(f'{pad}{fmt.size_nicenum(2**(bucket+offset)):>8}: '
+                         f'{count:>6} {stars[:nstars]}')
+        print("\n".join(lines))
+
+        #
+        # We already have the counts at hand so compute the median from
+        # them rather than going through print_histogram_median(), which
+        # would read the histogram from the target again.
+        #
+        median = ZFSHistogram.counts_median(counts, offset)
+        if median > 0:
+            print(f'{pad}Approx. Median: {fmt.size_nicenum(median)}')
 
     def _call(self, objs: Iterable[drgn.Object]) -> None:
         for obj in objs:
@@ -17,7 +17,9 @@
 
 # pylint: disable=missing-docstring
 
+import functools
 import os
+from typing import Dict, Union
 
 import drgn
 import sdb
@@ -34,12 +36,63 @@ def removeprefix(text: str, prefix: str) -> str:
     return text[text.startswith(prefix) and len(prefix):]
 
 
-def nicenum(num: int, suffix: str = "B") -> str:
-    for unit in ["", "K", "M", "G", "T", "P", "E", "Z"]:
-        if num < 1024:
-            return f"{int(num)}{unit}{suffix}"
-        num = int(num / 1024)
-    return "{int(num)}Y{suffix}"
+@functools.lru_cache(maxsize=None)
+def _enum_names(prog: drgn.Program, type_name: str) -> Dict[int, str]:
+    #
+    # The program is passed explicitly, and is therefore part of the
+    # cache key, so we never return names of a previous target.
+    #
+    enumerators = sdb.type_canonicalize(prog.type(type_name)).enumerators
+    prefix = os.path.commonprefix([e.name for e in enumerators])
+    prefix_len = prefix.rfind("_") + 1
+    #
+    # If multiple enumerators share the same value, the first one wins
+    # (like it does when drgn formats an enum value).
+    #
+    return {e.value: e.name[prefix_len:] for e in reversed(enumerators)}
+
+
+def enum_names(type_name: str) -> Dict[int, str]:
+    """
+    Returns a table mapping the values of the given enum type to the
+    names of their enumerators, without the prefix that is common to
+    all of the enum's enumerators (e.g. "HEALTHY" instead of
+    "VDEV_STATE_HEALTHY"). The table is built once per target.
+    """
+    return _enum_names(sdb.get_prog(), type_name)
+
+
+NICENUM_UNITS = ["", "K", "M", "G", "T", "P", "E", "Z", "Y"]
+
+
+def nicenum(num: Union[drgn.Object, int], suffix: str = "B") -> str:
+    num = int(num)
+    if num < 1024:
+        return f"{num}{suffix}"
+    #
+    # Each unit is 10 bits wide, so the unit can be derived
+    # from the position of the most significant bit.
+    #
+    idx = min((num.bit_length() - 1) // 10, len(NICENUM_UNITS) - 1)
+    return f"{num >> (10 * idx)}{NICENUM_UNITS[idx]}{suffix}"
+
+
+def read_array(ptr: drgn.Object, start: int, count: int) -> drgn.Object:
+    """
+    Read the `count` elements that `ptr` points to, starting from
+    `ptr[start]`, with a single memory access and return them as a
+    value object (e.g. a `foo_t *` pointer yields a `foo_t [count]`).
+
+    Indexing the returned array doesn't go back to the target, which
+    makes this a lot cheaper than indexing `ptr` directly when walking
+    large arrays element by element.
+    """
+    prog = sdb.get_prog()
+    elem_type = ptr.type_.type
+    elem_size = sdb.type_canonicalize_size(elem_type)
+    return drgn.Object(prog,
+                       prog.array_type(elem_type, count),
+                       address=int(ptr) + start * elem_size).read_()
 
 
 def gethrtime() -> int:
@@ -50,27 +103,41 @@ def gethrtime() -> int:
     nanoseconds as there is no set of fields that can give us
     that level of precision at all times.
     """
-    tkr = sdb.get_object("tk_core").timekeeper.tkr_raw
-    nsec = tkr.xtime_nsec >> tkr.shift
-    sec = sdb.get_object("tk_core").timekeeper.raw_sec
-    hrtime = sec * NANOSEC + nsec
-    return int(hrtime)
+    timekeeper = sdb.get_object("tk_core").timekeeper
+    tkr = timekeeper.tkr_raw
+    nsec = int(tkr.xtime_nsec) >> int(tkr.shift)
+    return int(timekeeper.raw_sec) * NANOSEC + nsec
+
 
+#
+# The helpers below accept either plain integers or drgn objects. The
+# latter are converted to integers right away so the bit manipulation
+# doesn't create a new drgn object for each intermediate result.
+#
 
-def P2PHASE(x: drgn.Object, align: int) -> int:
-    return int(x & (align - 1))
 
+def P2PHASE(x: Union[drgn.Object, int], align: int) -> int:
+    return int(x) & (align - 1)
 
-def BF64_DECODE(x: drgn.Object, low: int, length: int) -> int:
-    return int(P2PHASE(x >> low, 1 << length))
 
+def BF64_DECODE(x: Union[drgn.Object, int], low: int, length: int) -> int:
+    return P2PHASE(int(x) >> low, 1 << length)
 
-def BF64_GET(x: drgn.Object, low: int, length: int) -> int:
-    return BF64_DECODE(x, low, length)
 
+#
+# BF64_GET() and BF64_GET_SB() are used for every field that we decode
+# so they do their shift and mask directly instead of going through
+# BF64_DECODE() and P2PHASE().
+#
 
-def BF64_GET_SB(x: int, low: int, length: int, shift: int, bias: int) -> int:
-    return (BF64_GET(x, low, length) + bias) << shift
+
+def BF64_GET(x: Union[drgn.Object, int], low: int, length: int) -> int:
+    return (int(x) >> low) & ((1 << length) - 1)
+
+
+def BF64_GET_SB(x: Union[drgn.Object, int], low: int, length: int, shift: int,
+                bias: int) -> int:
+    return (((int(x) >> low) & ((1 << length) - 1)) + bias) << shift
 
 
 def WEIGHT_IS_SPACEBASED(weight: int) -> bool:
@@ -159,20 +226,30 @@ def BP_GET_BYTEORDER(bp: drgn.Object) -> int:
     return BF64_GET(bp.blk_prop, 63, 1)
 
 
+@functools.lru_cache(maxsize=None)
+def _blkptr_has_member(prog: drgn.Program, member: str) -> bool:
+    #
+    # The birth fields of blkptr_t were renamed in newer versions of
+    # ZFS. Look the type up once per target rather than once for every
+    # block pointer that we decode.
+    #
+    return bool(prog.type('blkptr_t').has_member(member))
+
+
 def BP_GET_LAYER(bp: drgn.Object) -> int:
-    if sdb.get_type('blkptr_t').has_member('blk_logical_birth'):
+    if _blkptr_has_member(sdb.get_prog(), 'blk_logical_birth'):
         return BF64_GET(bp.blk_logical_birth, 56, 8)
     return BF64_GET(bp.blk_birth, 56, 8)
 
 
 def BP_LOGICAL_BIRTH(bp: drgn.Object) -> int:
-    if sdb.get_type('blkptr_t').has_member('blk_logical_birth'):
+    if _blkptr_has_member(sdb.get_prog(), 'blk_logical_birth'):
         return BF64_GET(bp.blk_logical_birth, 0, 56)
     return BF64_GET(bp.blk_birth, 0, 56)
 
 
 def BP_PHYSICAL_BIRTH(bp: drgn.Object) -> int:
-    if sdb.get_type('blkptr_t').has_member('blk_physical_birth'):
+    if _blkptr_has_member(sdb.get_prog(), 'blk_physical_birth'):
         return BF64_GET(bp.blk_physical_birth, 0, 56)
     return BF64_GET(bp.blk_phys_birth, 0, 56)
 
@@ -180,8 +257,9 @@ def BP_PHYSICAL_BIRTH(bp: drgn.Object) -> int:
 def BP_GET_BIRTH(bp: drgn.Object) -> int:
     if BP_IS_EMBEDDED(bp):
         return 0
-    if BP_PHYSICAL_BIRTH(bp):
-        return BP_PHYSICAL_BIRTH(bp)
+    physical_birth = BP_PHYSICAL_BIRTH(bp)
+    if physical_birth:
+        return physical_birth
     return BP_LOGICAL_BIRTH(bp)
 
 
@@ -215,10 +293,12 @@ def BP_IS_HOLE(bp: drgn.Object) -> bool:
 def BP_GET_NDVAS(bp: drgn.Object) -> int:
     if BP_IS_EMBEDDED(bp):
         return 0
-    ndvas = 0
-    for d in range(0, 3):
-        ndvas += DVA_GET_ASIZE(bp.blk_dva[d]) != 0
-    return ndvas
+    #
+    # A block pointer always has exactly SPA_DVAS_PER_BP (3) DVAs.
+    #
+    dva = bp.blk_dva
+    return ((DVA_GET_ASIZE(dva[0]) != 0) + (DVA_GET_ASIZE(dva[1]) != 0) +
+            (DVA_GET_ASIZE(dva[2]) != 0))
 
 
 def DVA_GET_ASIZE(dva: drgn.Object) -> int:
@@ -238,7 +318,7 @@ def DVA_IS_VALID(dva: drgn.Object) -> bool:
 
 
 def DVA_IS_EMPTY(dva: drgn.Object) -> bool:
-    return bool(dva.dva_word[0] == 0 and dva.dva_word[1] == 0)
+    return int(dva.dva_word[0]) == 0 and int(dva.dva_word[1]) == 0
 
 
 def DMU_OT_IS_ENCRYPTED(ot: int) -> bool:
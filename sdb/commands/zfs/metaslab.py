@@ -17,16 +17,27 @@
 # pylint: disable=missing-docstring
 
 import argparse
-from typing import Iterable
+from typing import Callable, Iterable, List, Tuple
 
 import drgn
 import sdb
-from sdb.commands.zfs.internal import (
-    METASLAB_ACTIVE_MASK, METASLAB_WEIGHT_CLAIM, METASLAB_WEIGHT_PRIMARY,
-    METASLAB_WEIGHT_SECONDARY, METASLAB_WEIGHT_TYPE, WEIGHT_GET_COUNT,
-    WEIGHT_GET_INDEX, WEIGHT_IS_SPACEBASED, BTREE_LEAF_SIZE, nicenum)
+from sdb.commands.zfs.internal import (METASLAB_ACTIVE_MASK,
+                                       METASLAB_WEIGHT_CLAIM,
+                                       METASLAB_WEIGHT_TYPE, WEIGHT_GET_COUNT,
+                                       WEIGHT_GET_INDEX, WEIGHT_IS_SPACEBASED,
+                                       BTREE_LEAF_SIZE, nicenum, read_array)
 from sdb.commands.zfs.histograms import ZFSHistogram
 
+#
+# The active bits of a metaslab's weight (CLAIM, SECONDARY, and PRIMARY
+# from least to most significant) are next to each other at the top of
+# the weight. Shifted down, they index the table below which gives the
+# character of the highest active bit (i.e. P takes precedence over S,
+# and S over C).
+#
+WEIGHT_ACTIVE_SHIFT = METASLAB_WEIGHT_CLAIM.bit_length() - 1
+WEIGHT_CHARS = "-CSSPPPP"
+
 
 class Metaslab(sdb.Locator, sdb.PrettyPrinter):
     names = ["metaslab"]
@@ -54,129 +65,135 @@ class Metaslab(sdb.Locator, sdb.PrettyPrinter):
         parser.add_argument("metaslab_ids", nargs="*", type=int)
         return parser
 
+    @staticmethod
+    def weight_str(weight: int) -> str:
+        if WEIGHT_IS_SPACEBASED(weight):
+            return nicenum(weight &
+                           ~(METASLAB_ACTIVE_MASK | METASLAB_WEIGHT_TYPE))
+        return (f"{WEIGHT_GET_COUNT(weight)} x "
+                f"{nicenum(1 << WEIGHT_GET_INDEX(weight))}")
+
+    @staticmethod
+    def frag_str(msp: drgn.Object, width: int) -> str:
+        #
+        # ms_fragmentation is unsigned, so we compare it as a drgn object
+        # (which converts -1 to the right type) rather than as an int.
+        #
+        fragmentation = msp.ms_fragmentation
+        if fragmentation == -1:
+            return f"{'-':>6}"
+        return f"{int(fragmentation):>{width}}%"
+
     @staticmethod
     def metaslab_weight_print(msp: drgn.Object, print_header: bool,
                               indent: int) -> None:
+        pad = " " * indent
         if print_header:
-            print(
-                "".ljust(indent),
-                "ID".rjust(3),
-                "ACTIVE".ljust(6),
-                "ALGORITHM".rjust(9),
-                "FRAG".rjust(4),
-                "ALLOC".rjust(10),
-                "MAXSZ".rjust(12),
-                "WEIGHT".rjust(12),
-            )
-            print("".ljust(indent), "-" * 65)
+            print(f"{pad} {'ID':>3} {'ACTIVE':<6} {'ALGORITHM':>9} "
+                  f"{'FRAG':>4} {'ALLOC':>10} {'MAXSZ':>12} {'WEIGHT':>12}")
+            print(f"{pad} {'-' * 65}")
+
+        #
+        # Read the whole metaslab from the target once rather than
+        # going back to it for each of the fields that we print.
+        #
+        msp = msp[0].read_()
         weight = int(msp.ms_weight)
-        if weight & METASLAB_WEIGHT_PRIMARY:
-            weight_char = "P"
-        elif weight & METASLAB_WEIGHT_SECONDARY:
-            weight_char = "S"
-        elif weight & METASLAB_WEIGHT_CLAIM:
-            weight_char = "C"
-        else:
-            weight_char = "-"
+        weight_char = WEIGHT_CHARS[(weight & METASLAB_ACTIVE_MASK) >>
+                                   WEIGHT_ACTIVE_SHIFT]
 
         if WEIGHT_IS_SPACEBASED(weight):
             algorithm = "SPACE"
         else:
             algorithm = "SEGMENT"
 
-        print(
-            "".ljust(indent),
-            str(int(msp.ms_id)).rjust(3),
-            weight_char.rjust(4),
-            "L" if msp.ms_loaded else " ",
-            algorithm.rjust(8),
-            end="",
-        )
-        if msp.ms_fragmentation == -1:
-            print("-".rjust(6), end="")
-        else:
-            print((str(int(msp.ms_fragmentation)) + "%").rjust(5), end="")
-        print(
-            str(str(int(msp.ms_allocated_space) >> 20) + "M").rjust(7),
-            f"({(int(msp.ms_allocated_space) * 100 / int(msp.ms_size)):.1f}%)".
-            rjust(7),
-            nicenum(msp.ms_max_size).rjust(10),
-            end="",
-        )
+        alloc = int(msp.ms_allocated_space)
+        alloc_pct = f"({alloc * 100 / int(msp.ms_size):.1f}%)"
+        loaded = "L" if msp.ms_loaded else " "
+        print(f"{pad} {int(msp.ms_id):>3} {weight_char:>4} {loaded} "
+              f"{algorithm:>8}{Metaslab.frag_str(msp, 4)}{alloc >> 20:>6}M "
+              f"{alloc_pct:>7} {nicenum(int(msp.ms_max_size)):>10} "
+              f"{Metaslab.weight_str(weight):>12}")
 
-        if WEIGHT_IS_SPACEBASED(weight):
-            print(
-                "",
-                nicenum(weight &
-                        ~(METASLAB_ACTIVE_MASK | METASLAB_WEIGHT_TYPE)).rjust(
-                            12),
-            )
-        else:
-            count = str(WEIGHT_GET_COUNT(weight))
-            size = nicenum(1 << WEIGHT_GET_INDEX(weight))
-            print("", (count + " x " + size).rjust(12))
+    @staticmethod
+    def unflushed_changes(msp: drgn.Object) -> Tuple[int, int]:
+        """
+        Return the net space freed by the unflushed changes of the
+        metaslab and the memory that the changes take up.
+        """
+        #
+        # Read the unflushed range trees from the target once rather
+        # than going back to it for each of the fields that we need.
+        #
+        frees = msp.ms_unflushed_frees[0].read_()
+        allocs = msp.ms_unflushed_allocs[0].read_()
+        space = int(frees.rt_space) - int(allocs.rt_space)
+
+        #
+        # BTREE_LEAF_SIZE is a plain integer constant, so converting the
+        # node counts upfront keeps all of this in Python integer math.
+        #
+        nodes = (int(frees.rt_root.bt_num_nodes) +
+                 int(allocs.rt_root.bt_num_nodes))
+        return space, nodes * BTREE_LEAF_SIZE
 
     @staticmethod
     def print_metaslab(msp: drgn.Object, print_header: bool,
                        indent: int) -> None:
+        pad = " " * indent
+        if print_header:
+            print(f"{pad} {'ADDR':<18} {'ID':>4} {'OFFSET':>16} {'FREE':>8} "
+                  f"{'FRAG':>5} {'UCMU':>8}")
+            print(f"{pad} {'-' * 65}")
+
+        #
+        # Read the whole metaslab from the target once rather than
+        # going back to it for each of the fields that we print.
+        #
+        addr, msp = msp, msp[0].read_()
         spacemap = msp.ms_sm
 
-        if print_header:
-            print(
-                "".ljust(indent),
-                "ADDR".ljust(18),
-                "ID".rjust(4),
-                "OFFSET".rjust(16),
-                "FREE".rjust(8),
-                "FRAG".rjust(5),
-                "UCMU".rjust(8),
-            )
-            print("".ljust(indent), "-" * 65)
-
-        free = msp.ms_size
+        free = int(msp.ms_size)
         if not sdb.is_null(spacemap):
-            free -= spacemap.sm_phys.smp_alloc
-
-        ufrees = msp.ms_unflushed_frees.rt_space
-        uallocs = msp.ms_unflushed_allocs.rt_space
-        free = free + ufrees - uallocs
-
-        uchanges_free_mem = msp.ms_unflushed_frees.rt_root.bt_num_nodes
-        uchanges_free_mem *= BTREE_LEAF_SIZE
-        uchanges_alloc_mem = msp.ms_unflushed_allocs.rt_root.bt_num_nodes
-        uchanges_alloc_mem *= BTREE_LEAF_SIZE
-        uchanges_mem = uchanges_free_mem + uchanges_alloc_mem
-
-        print(
-            "".ljust(indent),
-            hex(msp).ljust(16),
-            str(int(msp.ms_id)).rjust(4),
-            hex(msp.ms_start).rjust(16),
-            nicenum(free).rjust(8),
-            end="",
-        )
-        if msp.ms_fragmentation == -1:
-            print("-".rjust(6), end="")
-        else:
-            print((str(int(msp.ms_fragmentation)) + "%").rjust(6), end="")
-        print(nicenum(uchanges_mem).rjust(9))
+            free -= int(spacemap.sm_phys.smp_alloc)
+
+        uspace, uchanges_mem = Metaslab.unflushed_changes(msp)
+        free += uspace
+
+        print(f"{pad} {hex(addr):<16} {int(msp.ms_id):>4} "
+              f"{hex(int(msp.ms_start)):>16} {nicenum(free):>8}"
+              f"{Metaslab.frag_str(msp, 5)}{nicenum(uchanges_mem):>9}")
+
+    @staticmethod
+    def print_metaslab_histogram(msp: drgn.Object, print_header: bool,
+                                 indent: int) -> None:
+        # pylint: disable=unused-argument
+        spacemap = msp.ms_sm
+        if not sdb.is_null(spacemap):
+            histogram = spacemap.sm_phys.smp_histogram
+            ZFSHistogram.print_histogram(histogram, int(spacemap.sm_shift),
+                                         indent + 5)
 
     def print_indented(self,
                        metaslabs: Iterable[drgn.Object],
                        indent: int = 0) -> None:
+        #
+        # The flags passed to us don't change from one metaslab to the
+        # next, so figure out what needs to be printed for each one
+        # (and in which order) upfront.
+        #
+        printers: List[Callable[[drgn.Object, bool, int], None]] = []
+        if not self.args.weight:
+            printers.append(Metaslab.print_metaslab)
+        if self.args.histogram:
+            printers.append(Metaslab.print_metaslab_histogram)
+        if self.args.weight:
+            printers.append(Metaslab.metaslab_weight_print)
+
         first_time = True
         for msp in metaslabs:
-            if not self.args.weight:
-                Metaslab.print_metaslab(msp, first_time, indent)
-            if self.args.histogram:
-                spacemap = msp.ms_sm
-                if not sdb.is_null(spacemap):
-                    histogram = spacemap.sm_phys.smp_histogram
-                    ZFSHistogram.print_histogram(histogram,
-                                                 int(spacemap.sm_shift),
-                                                 indent + 5)
-            if self.args.weight:
-                Metaslab.metaslab_weight_print(msp, first_time, indent)
+            for printer in printers:
+                printer(msp, first_time, indent)
             first_time = False
 
     def pretty_print(self, objs: Iterable[drgn.Object]) -> None:
@@ -184,6 +201,12 @@ class Metaslab(sdb.Locator, sdb.PrettyPrinter):
 
     @sdb.InputHandler("vdev_t*")
     def from_vdev(self, vdev: drgn.Object) -> Iterable[drgn.Object]:
+        #
+        # Both branches yield metaslab_t pointer values (rather than
+        # references to the elements of vdev_ms) so that the objects
+        # passed down the pipeline are the same either way.
+        #
+        ms_type = vdev.vdev_ms.type_.type
         if self.args.metaslab_ids:
             # yield the requested metaslabs
             for i in self.args.metaslab_ids:
@@ -193,8 +216,14 @@ class Metaslab(sdb.Locator, sdb.PrettyPrinter):
                     raise sdb.CommandError(
                         self.name, f"metaslab id {i} not valid; "
                         f"there are only {ms_count} metaslabs in vdev {vdev}")
-                yield vdev.vdev_ms[i]
+                yield sdb.create_object(ms_type, int(vdev.vdev_ms[i]))
         else:
-            for i in range(int(vdev.vdev_ms_count)):
-                msp = vdev.vdev_ms[i]
-                yield msp
+            #
+            # Read the array of metaslab pointers in one go instead of
+            # indexing vdev_ms (and thus going to the target) for each
+            # metaslab.
+            #
+            ms_count = int(vdev.vdev_ms_count)
+            if ms_count > 0:
+                for ptr in read_array(vdev.vdev_ms, 0, ms_count).value_():
+                    yield sdb.create_object(ms_type, ptr)
@@ -24,41 +24,57 @@ from sdb.commands.zfs.btree import Btree
 from sdb.command import Cast
 
 
+# RangeTreeSeg is a SingleInputCommand, and it's like a pretty-printer
+# for range_seg*_t's, but since it has no `names`, it can't be invoked
+# from the command line. The reason is that range_seg*_t's specify their
+# ranges relative to rt_start/rt_shift, which are not accessible from
+# the range_seg*_t. Therefore, they can only be pretty-printed as part
+# of a range_tree_t*, from the range_tree pretty-printer.
+class RangeTreeSeg(sdb.SingleInputCommand):
+
+    def __init__(self, rt: drgn.Object, has_fill: bool):
+        super().__init__()
+        self.rt = rt
+        self.has_fill = has_fill
+        #
+        # These are the same for every segment of the tree so we read
+        # them once and do all the math below on plain integers.
+        #
+        self.shift = int(rt.rt_shift)
+        self.start = int(rt.rt_start)
+
+    def _call_one(self, obj: drgn.Object) -> None:
+        seg = obj[0].read_()
+        start = (int(seg.rs_start) << self.shift) + self.start
+        end = (int(seg.rs_end) << self.shift) + self.start
+        if self.has_fill:
+            fill = int(seg.rs_fill) << self.shift
+            print(f"    [{hex(start)} {hex(end)}) "
+                  f"(length {hex(end - start)}) "
+                  f"(fill {hex(fill)})")
+        else:
+            print(f"    [{hex(start)} {hex(end)}) "
+                  f"(length {hex(end - start)})")
+
+
 class RangeTree(sdb.PrettyPrinter):
     names = ['range_tree']
     input_type = 'range_tree_t *'
     load_on = [sdb.Module("zfs"), sdb.Library("libzpool")]
 
     def pretty_print(self, objs: Iterable[drgn.Object]) -> None:
-
-        # RangeTreeSeg is a SingleInputCommand, and it's like a pretty-printer
-        # for range_seg*_t's, but since it has no `names`, it can't be invoked
-        # from the command line. The reason is that range_seg*_t's specify their
-        # ranges relative to rt_start/rt_shift, which are not accessible from
-        # the range_seg*_t. Therefore, they can only be pretty-printed as part
-        # of a range_tree_t*, from the range_tree pretty-printer.
-        class RangeTreeSeg(sdb.SingleInputCommand):
-
-            def __init__(self, rt: drgn.Object):
-                super().__init__()
-                self.rt = rt
-
-            def _call_one(self, obj: drgn.Object) -> None:
-                start = (obj.rs_start << self.rt.rt_shift) + self.rt.rt_start
-                end = (obj.rs_end << self.rt.rt_shift) + self.rt.rt_start
-                if hasattr(self.rt, 'rs_fill'):
-                    fill = obj.rs_fill << self.rt.rt_shift
-                    print(f"    [{hex(start)} {hex(end)}) "
-                          f"(length {hex(end - start)}) "
-                          f"(fill {hex(fill)})")
-                else:
-                    print(f"    [{hex(start)} {hex(end)}) "
-                          f"(length {hex(end - start)})")
-
+        #
+        # Only the segments of gap range trees (range_seg_gap_t) have
+        # an rs_fill member. Whether that's the case is the same for all
+        # segments of a range tree, so we figure it out once per tree.
+        #
+        enum_dict = dict(sdb.get_type('enum range_seg_type').enumerators)
         for rt in objs:
             print(f"{hex(rt)}: range tree of {int(rt.rt_root.bt_num_elems)} "
                   f"entries, {int(rt.rt_space)} bytes")
-            for _ in sdb.execute_pipeline([rt], [RangeSeg(), RangeTreeSeg(rt)]):
+            has_fill = int(rt.rt_type) == enum_dict['RANGE_SEG_GAP']
+            for _ in sdb.execute_pipeline(
+                [rt], [RangeSeg(), RangeTreeSeg(rt, has_fill)]):
                 pass
 
 
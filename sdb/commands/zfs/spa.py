@@ -17,7 +17,7 @@
 # pylint: disable=missing-docstring
 
 import argparse
-from typing import Iterable, List, Optional
+from typing import FrozenSet, Iterable, List, Optional
 
 import drgn
 import sdb
@@ -65,10 +65,14 @@ class Spa(sdb.Locator, sdb.PrettyPrinter):
             self.arg_list.append("-H")
         if self.args.weight:
             self.arg_list.append("-w")
+        self.poolnames: FrozenSet[str] = frozenset(self.args.poolnames)
 
     def pretty_print(self, objs: Iterable[drgn.Object]) -> None:
         print(f"{'ADDR':18} NAME")
         print(f"{('-' * 60)}")
+        if self.args.vdevs or self.args.metaslab:
+            vdev_locator = Vdev()
+            vdev_printer = Vdev(self.arg_list)
         for spa in objs:
             spa_name = spa.spa_name.string_().decode("utf-8")
             print(f"{hex(spa):18} {spa_name}")
@@ -77,16 +81,29 @@ class Spa(sdb.Locator, sdb.PrettyPrinter):
                                              0, 5)
 
             if self.args.vdevs or self.args.metaslab:
-                vdevs = sdb.execute_pipeline([spa], [Vdev()])
-                Vdev(self.arg_list).print_indented(vdevs, 5)
+                vdevs = sdb.execute_pipeline([spa], [vdev_locator])
+                vdev_printer.print_indented(vdevs, 5)
 
     def no_input(self) -> drgn.Object:
         spas = sdb.execute_pipeline(
             [sdb.get_object("spa_namespace_avl").address_of_()],
             [Avl(), sdb.Cast(["spa_t *"])],
         )
+        if not self.poolnames:
+            yield from spas
+            return
+
+        #
+        # Pool names are unique, so once we've come across all the
+        # pools that were asked for there is no point in walking the
+        # rest of the namespace.
+        #
+        remaining = set(self.poolnames)
         for spa in spas:
-            if (self.args.poolnames and spa.spa_name.string_().decode("utf-8")
-                    not in self.args.poolnames):
+            spa_name = spa.spa_name.string_().decode("utf-8")
+            if spa_name not in remaining:
                 continue
             yield spa
+            remaining.remove(spa_name)
+            if not remaining:
+                break
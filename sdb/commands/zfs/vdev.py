@@ -17,13 +17,13 @@
 # pylint: disable=missing-docstring
 
 import argparse
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import drgn
 import sdb
 from sdb.commands.zfs.metaslab import Metaslab
 from sdb.commands.zfs.histograms import ZFSHistogram
-from sdb.commands.zfs.internal import removeprefix
+from sdb.commands.zfs.internal import enum_names, read_array
 
 
 class Vdev(sdb.Locator, sdb.PrettyPrinter):
@@ -32,6 +32,9 @@ class Vdev(sdb.Locator, sdb.PrettyPrinter):
     output_type = "vdev_t *"
     load_on = [sdb.Module("zfs"), sdb.Library("libzpool")]
 
+    # Headers for the vdev_isl2cache, vdev_islog and vdev_isspare sections.
+    SECTION_LABELS = ("cache", "logs", "spares")
+
     @classmethod
     def _init_parser(cls, name: str) -> argparse.ArgumentParser:
         parser = super()._init_parser(name)
@@ -73,76 +76,94 @@ class Vdev(sdb.Locator, sdb.PrettyPrinter):
     def print_indented(self,
                        vdevs: Iterable[drgn.Object],
                        indent: int = 0) -> None:
-        print(
-            "".ljust(indent),
-            "ADDR".ljust(18),
-            "STATE".ljust(7),
-            "AUX".ljust(4),
-            "DESCRIPTION",
-        )
-        print("".ljust(indent), "-" * 60)
-
-        prev = None
+        pad = " " * indent
+        print(f"{pad} {'ADDR':<18} {'STATE':<7} {'AUX':<4} DESCRIPTION")
+        print(f"{pad} {'-' * 60}")
+        section_pad = f"{pad} {'-':<18} {'-':<7} {'-':<4} "
+
+        #
+        # The state and aux names are a handful of values that repeat on
+        # every row, so look the tables up once for the whole listing.
+        #
+        names = (enum_names("vdev_state_t"), enum_names("vdev_aux_t"))
+        depths: Dict[int, int] = {}
+        #
+        # The metaslab locator and printer are the same for every vdev,
+        # so construct them (and parse their arguments) only once.
+        #
+        if self.args.metaslab:
+            ms_locator = Metaslab()
+            ms_printer = Metaslab(self.arg_list)
+        prev_flags: Optional[Tuple[bool, ...]] = None
         for vdev in vdevs:
-            level = 0
-            pvd = vdev.vdev_parent
-            while pvd:
-                level += 2
-                pvd = pvd.vdev_parent
-
-            if vdev.vdev_isl2cache and prev and not prev.vdev_isl2cache:
-                print("".ljust(indent), "-".ljust(18), "-".ljust(7),
-                      "-".ljust(4), "".ljust(0), "cache")
-            if vdev.vdev_islog and prev and not prev.vdev_islog:
-                print("".ljust(indent), "-".ljust(18), "-".ljust(7),
-                      "-".ljust(4), "".ljust(0), "logs")
-            if vdev.vdev_isspare and prev and not prev.vdev_isspare:
-                print("".ljust(indent), "-".ljust(18), "-".ljust(7),
-                      "-".ljust(4), "".ljust(0), "spares")
-            if vdev.vdev_isl2cache or vdev.vdev_isspare:
+            level = self.vdev_depth(vdev, depths)
+
+            #
+            # Print a section header whenever we move from the regular
+            # vdevs into the cache, log, or spare devices.
+            #
+            flags = (bool(vdev.vdev_isl2cache), bool(vdev.vdev_islog),
+                     bool(vdev.vdev_isspare))
+            if prev_flags is not None:
+                self.print_sections(flags, prev_flags, section_pad)
+            prev_flags = flags
+            if flags[0] or flags[2]:
                 level = 2
 
-            if int(vdev.vdev_path) != 0:
-                print(
-                    "".ljust(indent),
-                    hex(vdev).ljust(18),
-                    removeprefix(
-                        drgn.cast("vdev_state_t",
-                                  vdev.vdev_state).format_(type_name=False),
-                        'VDEV_STATE_').ljust(7),
-                    removeprefix(
-                        drgn.cast(
-                            "vdev_aux_t",
-                            vdev.vdev_stat.vs_aux).format_(type_name=False),
-                        'VDEV_AUX_').ljust(4),
-                    "".ljust(level),
-                    vdev.vdev_path.string_().decode("utf-8"),
-                )
-
-            else:
-                print(
-                    "".ljust(indent),
-                    hex(vdev).ljust(18),
-                    removeprefix(
-                        drgn.cast("vdev_state_t",
-                                  vdev.vdev_state).format_(type_name=False),
-                        'VDEV_STATE_').ljust(7),
-                    removeprefix(
-                        drgn.cast(
-                            "vdev_aux_t",
-                            vdev.vdev_stat.vs_aux).format_(type_name=False),
-                        'VDEV_AUX_').ljust(4),
-                    "".ljust(level),
-                    vdev.vdev_ops.vdev_op_type.string_().decode("utf-8"),
-                )
+            print(f"{pad} {self.vdev_row(vdev, level, *names)}")
             if self.args.histogram:
                 if not sdb.is_null(vdev.vdev_mg):
                     ZFSHistogram.print_histogram(vdev.vdev_mg.mg_histogram, 0,
                                                  indent + 5)
-            prev = vdev
             if self.args.metaslab:
-                metaslabs = sdb.execute_pipeline([vdev], [Metaslab()])
-                Metaslab(self.arg_list).print_indented(metaslabs, indent + 5)
+                metaslabs = sdb.execute_pipeline([vdev], [ms_locator])
+                ms_printer.print_indented(metaslabs, indent + 5)
+
+    @staticmethod
+    def print_sections(flags: Tuple[bool, ...], prev_flags: Tuple[bool, ...],
+                       section_pad: str) -> None:
+        for cur, was, label in zip(flags, prev_flags, Vdev.SECTION_LABELS):
+            if cur and not was:
+                print(f"{section_pad} {label}")
+
+    @staticmethod
+    def vdev_row(vdev: drgn.Object, level: int, state_names: Dict[int, str],
+                 aux_names: Dict[int, str]) -> str:
+        path = vdev.vdev_path
+        if int(path) != 0:
+            desc = path.string_().decode("utf-8")
+        else:
+            desc = vdev.vdev_ops.vdev_op_type.string_().decode("utf-8")
+        state_val = int(vdev.vdev_state)
+        aux_val = int(vdev.vdev_stat.vs_aux)
+        state = state_names.get(state_val, str(state_val))
+        aux = aux_names.get(aux_val, str(aux_val))
+        return (f"{hex(vdev):<18} {state:<7} {aux:<4} "
+                f"{' ' * level} {desc}")
+
+    @staticmethod
+    def vdev_depth(vdev: drgn.Object, depths: Dict[int, int]) -> int:
+        """
+        Return the indentation level of the given vdev (two spaces for
+        every ancestor), remembering it in `depths` keyed by address.
+
+        Vdevs normally arrive in tree order so the parent's level is
+        already known and we don't have to walk up to the root vdev
+        again for every child.
+        """
+        parent = vdev.vdev_parent
+        paddr = int(parent)
+        if paddr == 0:
+            level = 0
+        elif paddr in depths:
+            level = depths[paddr] + 2
+        else:
+            level = 0
+            while parent:
+                level += 2
+                parent = parent.vdev_parent
+        depths[int(vdev)] = level
+        return level
 
     def pretty_print(self, objs: Iterable[drgn.Object]) -> None:
         self.print_indented(objs, 0)
@@ -163,10 +184,11 @@ class Vdev(sdb.Locator, sdb.PrettyPrinter):
         else:
             yield from self.from_vdev(spa.spa_root_vdev)
 
-        for j in range(spa.spa_l2cache.sav_count):
-            yield from self.from_vdev(spa.spa_l2cache.sav_vdevs[j])
-        for j in range(spa.spa_spares.sav_count):
-            yield from self.from_vdev(spa.spa_spares.sav_vdevs[j])
+        for sav in (spa.spa_l2cache, spa.spa_spares):
+            count = int(sav.sav_count)
+            if count > 0:
+                for aux_vdev in read_array(sav.sav_vdevs, 0, count):
+                    yield from self.from_vdev(aux_vdev)
 
     @sdb.InputHandler("vdev_t*")
     def from_vdev(self, vdev: drgn.Object) -> Iterable[drgn.Object]:
@@ -174,7 +196,16 @@ class Vdev(sdb.Locator, sdb.PrettyPrinter):
             raise sdb.CommandError(
                 self.name, "when providing a vdev, "
                 "specific child vdevs can not be requested")
-        yield vdev
-        for cid in range(int(vdev.vdev_children)):
-            cvd = vdev.vdev_child[cid]
-            yield from self.from_vdev(cvd)
+        #
+        # Walk the vdev tree depth-first with an explicit stack rather
+        # than through recursive generators. Children are pushed in
+        # reverse so they come out in the same order as vdev_child.
+        #
+        stack = [vdev]
+        while stack:
+            vd = stack.pop()
+            yield vd
+            count = int(vd.vdev_children)
+            if count > 0:
+                children = list(read_array(vd.vdev_child, 0, count))
+                stack.extend(reversed(children))
@@ -18,12 +18,14 @@
 
 import argparse
 import datetime
-from typing import Iterable
+from typing import Iterable, Optional, Union
 
 import drgn
 import sdb
 from sdb.commands.spl.spl_list import SPLList
 
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
 
 class ZfsDbgmsg(sdb.Locator, sdb.PrettyPrinter):
     names = ["zfs_dbgmsg"]
@@ -41,19 +43,33 @@ class ZfsDbgmsg(sdb.Locator, sdb.PrettyPrinter):
     @staticmethod
     def print_msg(obj: drgn.Object,
                   print_timestamp: bool = False,
-                  print_address: bool = False) -> None:
+                  print_address: bool = False,
+                  msg_type: Optional[drgn.Type] = None) -> None:
+        prefix = ""
         if print_address:
-            print(f"{hex(obj)} ", end="")
+            prefix = f"{hex(obj)} "
         if print_timestamp:
             timestamp = datetime.datetime.fromtimestamp(int(obj.zdm_timestamp))
-            print(f"{timestamp.strftime('%Y-%m-%dT%H:%M:%S')}: ", end="")
+            prefix += f"{timestamp.strftime(TIMESTAMP_FORMAT)}: "
 
-        print(drgn.cast("char *", obj.zdm_msg).string_().decode("utf-8"))
+        #
+        # zdm_msg is declared as a one-element array at the end of the
+        # struct, so we need to cast it to a pointer to get the whole
+        # string. Callers printing many messages can pass the resolved
+        # "char *" type so we don't parse the type name every time.
+        #
+        char_ptr: Union[str, drgn.Type] = "char *"
+        if msg_type is not None:
+            char_ptr = msg_type
+        msg = drgn.cast(char_ptr, obj.zdm_msg).string_().decode("utf-8")
+        print(f"{prefix}{msg}")
 
     def pretty_print(self, objs: Iterable[drgn.Object]) -> None:
+        msg_type = sdb.get_prog().type("char *")
+        print_timestamp = self.args.verbose >= 1
+        print_address = self.args.verbose >= 2
         for obj in objs:
-            ZfsDbgmsg.print_msg(obj, self.args.verbose >= 1, self.args.verbose
-                                >= 2)
+            ZfsDbgmsg.print_msg(obj, print_timestamp, print_address, msg_type)
 
     def no_input(self) -> Iterable[drgn.Object]:
         proc_list = sdb.get_object("zfs_dbgmsgs").pl_list
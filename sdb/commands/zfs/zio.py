@@ -18,11 +18,26 @@
 # pylint: disable=missing-docstring
 
 import argparse
-from typing import Iterable, List, Optional
+import functools
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 import drgn
 import sdb
-from sdb.commands.zfs.internal import gethrtime, removeprefix, NANOSEC, MSEC
+from sdb.commands.zfs.internal import (enum_names, gethrtime, removeprefix,
+                                       NANOSEC, MSEC)
+
+NS_PER_MS = NANOSEC // MSEC
+
+
+@functools.lru_cache(maxsize=None)
+def parent_list_offsets(prog: drgn.Program) -> Tuple[int, int]:
+    """
+    Returns the offsets of the head of a zio's parent list and of the
+    head's next pointer within zio_t.
+    """
+    zio_type = prog.type("zio_t")
+    return (drgn.offsetof(zio_type, "io_parent_list.list_head"),
+            drgn.offsetof(zio_type, "io_parent_list.list_head.next"))
 
 
 class Zio(sdb.Locator, sdb.PrettyPrinter):
@@ -60,6 +75,9 @@ class Zio(sdb.Locator, sdb.PrettyPrinter):
     output_type = "zio_t *"
     load_on = [sdb.Module("zfs"), sdb.Library("libzpool")]
 
+    # ADDRESS, TYPE, STAGE, WAITER, TIME_ELAPSED
+    ROW_FMT = "{:<30} {:<5} {:<16} {:<18} {:>12}".format
+
     @classmethod
     def _init_parser(cls, name: str) -> argparse.ArgumentParser:
         parser = super()._init_parser(name)
@@ -74,61 +92,125 @@ class Zio(sdb.Locator, sdb.PrettyPrinter):
         super().__init__(args, name)
         self.level = 0
         self.header_printed = 0
+        #
+        # Walk and Cast don't keep any state between invocations, so
+        # reuse the same instances for the links of every zio that we
+        # visit instead of constructing (and parsing the arguments of)
+        # new ones each time.
+        #
+        self.walk = sdb.Walk()
+        self.link_cast = sdb.Cast(["zio_link_t *"])
 
     def print_header(self) -> None:
         if self.header_printed == 0:
-            print(f'\033[4m{"ADDRESS":30} {"TYPE":<5} {"STAGE":<16} ' +
-                  f'{"WAITER":<18} {"TIME_ELAPSED":>12}\033[0m')
+            header = Zio.ROW_FMT("ADDRESS", "TYPE", "STAGE", "WAITER",
+                                 "TIME_ELAPSED")
+            print(f"\033[4m{header}\033[0m")
             self.header_printed = 1
 
     def pretty_print(self, objs: Iterable[drgn.Object]) -> None:
         self.print_header()
-        for zio in objs:
-            delta = waiter = "-"
-            stage = removeprefix(zio.io_stage.format_(type_name=False),
-                                 "ZIO_STAGE_")
-            if zio.io_error != 0:
-                stage = "FAILED"
+        stage_names = enum_names("enum zio_stage")
+        type_names: Dict[int, str] = {}
+        #
+        # Measure the elapsed time of all the zios against the same
+        # point in time, rather than reading the clock for each one.
+        #
+        now = gethrtime()
+        for ptr in objs:
+            print(self.format_row(ptr, now, stage_names, type_names))
+
+    def format_row(self, ptr: drgn.Object, now: int, stages: Dict[int, str],
+                   types: Dict[int, str]) -> str:
+        #
+        # Read the whole zio_t in one go. The fields below are then
+        # decoded from the local copy instead of going back to the
+        # target for each one of them.
+        #
+        zio = ptr[0].read_()
+        waiter = "-"
+        stage_val = int(zio.io_stage)
+        stage = stages.get(stage_val, str(stage_val))
+        if int(zio.io_error) != 0:
+            stage = "FAILED"
+        addr = " " * self.level + hex(ptr)
+        waiter_addr = int(zio.io_waiter)
+        if waiter_addr != 0:
+            waiter = hex(waiter_addr)
+        return Zio.ROW_FMT(addr, Zio.type_name(zio, types), stage, waiter,
+                           Zio.elapsed(zio, now))
+
+    @staticmethod
+    def type_name(zio: drgn.Object, type_names: Dict[int, str]) -> str:
+        #
+        # zio_type_t ends with ZIO_TYPES, which doesn't share the
+        # "ZIO_TYPE_" prefix of its enumerators, so enum_names()
+        # can't be used for it. There are only a handful of types
+        # though, so remember the ones we've formatted.
+        #
+        type_val = int(zio.io_type)
+        io_type = type_names.get(type_val)
+        if io_type is None:
             io_type = removeprefix(zio.io_type.format_(type_name=False),
                                    "ZIO_TYPE_")
-            addr = f'{" " * self.level}{format(hex(zio))}'
-            if not sdb.is_null(zio.io_waiter):
-                waiter = hex(int(zio.io_waiter))
-            if zio.io_timestamp != 0:
-                delta_ms = (gethrtime() - int(zio.io_timestamp)) / (NANOSEC /
-                                                                    MSEC)
-                delta = f"{str(int(delta_ms))}ms"
-            print(
-                f"{addr:30} {io_type:<5} {stage:<16} {waiter:<18} {delta:>12}")
+            type_names[type_val] = io_type
+        return io_type
+
+    @staticmethod
+    def elapsed(zio: drgn.Object, now: int) -> str:
+        timestamp = int(zio.io_timestamp)
+        if timestamp == 0:
+            return "-"
+        delta_ns = now - timestamp
+        # truncate towards zero, like int() of the quotient does
+        delta_ms = abs(delta_ns) // NS_PER_MS
+        if delta_ns < 0:
+            delta_ms = -delta_ms
+        return f"{delta_ms}ms"
 
     @sdb.InputHandler("zio_t*")
     def from_zio(self, zio: drgn.Object) -> Iterable[drgn.Object]:
-        yield zio
-
-        self.level += 1
         if self.args.recursive or self.args.children:
-            child_links = sdb.execute_pipeline(
-                [zio.io_child_list.address_of_()],
-                [sdb.Walk(), sdb.Cast(["zio_link_t *"])],
-            )
-            for c in child_links:
-                yield from self.from_zio(c.zl_child)
+            list_member, link_member = "io_child_list", "zl_child"
         elif self.args.parents:
-            child_links = sdb.execute_pipeline(
-                [zio.io_parent_list.address_of_()],
-                [sdb.Walk(), sdb.Cast(["zio_link_t *"])],
-            )
-            for c in child_links:
-                yield from self.from_zio(c.zl_parent)
-        self.level -= 1
+            list_member, link_member = "io_parent_list", "zl_parent"
+        else:
+            self.level = 0
+            yield zio
+            return
+
+        #
+        # Walk the zio tree depth-first with an explicit stack instead
+        # of recursive generators. self.level is set right before each
+        # zio is yielded so pretty_print() can indent it accordingly.
+        # Links are pushed in reverse to keep the order of the list.
+        #
+        stack = [(zio, 0)]
+        while stack:
+            cur, level = stack.pop()
+            self.level = level
+            yield cur
+            links = list(
+                sdb.execute_pipeline(
+                    [cur.member_(list_member).address_of_()],
+                    [self.walk, self.link_cast],
+                ))
+            for link in reversed(links):
+                stack.append((link.member_(link_member), level + 1))
+        self.level = 0
 
     @staticmethod
-    def zio_has_parents(zio: drgn.Object) -> bool:
-        parent_list = zio.io_parent_list.list_head.address_of_()
-        first_parent = parent_list.next
-        if parent_list != first_parent:
-            return True
-        return False
+    def zio_has_parents(zio: Union[drgn.Object, int]) -> bool:
+        #
+        # The parent list is empty when its head points back to itself.
+        # Read the head's next pointer straight from the target, so we
+        # don't create any drgn objects for the zios in the cache that
+        # we are about to skip.
+        #
+        prog = sdb.get_prog()
+        head_offset, next_offset = parent_list_offsets(prog)
+        addr = int(zio)
+        return prog.read_word(addr + next_offset) != addr + head_offset
 
     def no_input(self) -> drgn.Object:
         if self.args.parents:
@@ -137,10 +219,14 @@ class Zio(sdb.Locator, sdb.PrettyPrinter):
                 " when printing all parent ZIOs")
 
         zio_cache = drgn.cast("spl_kmem_cache_t *", sdb.get_object("zio_cache"))
-        zios = sdb.execute_pipeline(
-            [zio_cache.skc_linux_cache],
-            [sdb.Walk(), sdb.Cast(["zio_t *"])],
-        )
-        for zio in zios:
-            if not self.zio_has_parents(zio):
-                yield from self.from_zio(zio)
+        #
+        # Most zios in the cache have parents and are skipped, so look
+        # at the raw addresses that the walker returns and only create
+        # zio_t objects for the ones that we are going to use.
+        #
+        zio_type = sdb.get_type("zio_t *")
+        for obj in sdb.execute_pipeline([zio_cache.skc_linux_cache],
+                                        [self.walk]):
+            addr = int(obj)
+            if not self.zio_has_parents(addr):
+                yield from self.from_zio(sdb.create_object(zio_type, addr))
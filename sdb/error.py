@@ -84,10 +84,8 @@ class CommandEvalSyntaxError(CommandError):
     def __init__(self, command: str, err: SyntaxError) -> None:
         msg = f"{err.msg}:\n\t{err.text}"
         if err.offset is not None and err.text is not None:
-            nspaces: int = err.offset - 1
-            spaces_str = list(' ' * len(err.text))
-            spaces_str[nspaces] = '^'
-            indicator = ''.join(spaces_str)
+            nspaces: int = max(err.offset - 1, 0)
+            indicator = (' ' * nspaces + '^').ljust(len(err.text))
             msg += f"\n\t{indicator}"
         super().__init__(command, msg)
 
@@ -19,21 +19,23 @@ like the entry point, command line interface, etc...
 """
 
 import argparse
+import functools
 import os
 import re
 import sys
 
-from typing import List
+from typing import Iterable, List
 
 import drgn
 import sdb
 from sdb.internal.repl import REPL
 
 
-def parse_arguments() -> argparse.Namespace:
+@functools.lru_cache(maxsize=1)
+def argument_parser() -> argparse.ArgumentParser:
     """
-    Sets up argument parsing and does the first pass of validation
-    of the command line input.
+    Builds the parser of sdb's command line. The parser doesn't depend
+    on anything that can change at runtime, so it is only built once.
     """
     parser = argparse.ArgumentParser(prog="sdb",
                                      description="The Slick/Simple Debugger")
@@ -93,6 +95,15 @@ def parse_arguments() -> argparse.Namespace:
                         "--quiet",
                         action="store_true",
                         help="don't print non-fatal warnings")
+    return parser
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Sets up argument parsing and does the first pass of validation
+    of the command line input.
+    """
+    parser = argument_parser()
     args = parser.parse_args()
 
     #
@@ -127,6 +138,47 @@ def parse_arguments() -> argparse.Namespace:
     return args
 
 
+DEBUG_FILE_SUFFIXES = (".ko", ".debug")
+SHARED_OBJECT_RE = re.compile(r".+\.so(\.\d)?")
+
+
+def find_debug_files(root: str, no_filter: bool) -> Iterable[str]:
+    """
+    Returns the paths of all the files under `root` that may contain
+    debug info, in the same order that os.walk() would visit them.
+
+    We use os.scandir() directly as it hands us the full path of each
+    entry and whether it is a directory without any extra stat() calls.
+    Like os.walk(), symbolic links to directories are not followed and
+    directories that can't be read are skipped.
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                    continue
+                name = entry.name
+                if no_filter or name.endswith(
+                        DEBUG_FILE_SUFFIXES) or SHARED_OBJECT_RE.match(name):
+                    # matches:
+                    #     kernel modules - .ko suffix
+                    #     userland debug files - .debug suffix
+                    #     userland shared objects - .so suffix
+                    files.append(entry.path)
+    except OSError:
+        return
+    yield from files
+    for subdir in subdirs:
+        yield from find_debug_files(subdir, no_filter)
+
+
 def load_debug_info(prog: drgn.Program, dpaths: List[str], quiet: bool,
                     no_filter: bool) -> None:
     """
@@ -139,16 +191,7 @@ def load_debug_info(prog: drgn.Program, dpaths: List[str], quiet: bool,
         if os.path.isfile(path):
             prog.load_debug_info([path])
         elif os.path.isdir(path):
-            kos = []
-            for (ppath, __, files) in os.walk(path):
-                for i in files:
-                    if i.endswith(".ko") or i.endswith(".debug") or re.match(
-                            r".+\.so(\.\d)?", i) or no_filter:
-                        # matches:
-                        #     kernel modules - .ko suffix
-                        #     userland debug files - .debug suffix
-                        #     userland shared objects - .so suffix
-                        kos.append(os.sep.join([ppath, i]))
+            kos = list(find_debug_files(path, no_filter))
             try:
                 prog.load_debug_info(kos)
             except drgn.MissingDebugInfoError as debug_info_err:
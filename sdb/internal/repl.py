@@ -19,6 +19,7 @@
 import atexit
 import os
 import readline
+import sys
 import traceback
 from typing import Callable, List, Optional
 
@@ -44,20 +45,33 @@ class REPL:
         released under the public domain.
         """
 
-        def custom_complete(text: str, state: int) -> str:
-            #
-            # None is returned for the end of the completion session.
-            #
-            results = [x for x in vocabulary if x.startswith(text)
-                      ] + [None]  # type: ignore[list-item]
+        #
+        # Readline calls the completer repeatedly for a single completion
+        # (with state 0, 1, 2, ...) until it gets back None. Filter the
+        # vocabulary only when we're asked about a new text and serve
+        # the subsequent calls from the last result.
+        #
+        last_text: Optional[str] = None
+        matches: List[str] = []
+
+        def custom_complete(text: str, state: int) -> Optional[str]:
+            nonlocal last_text, matches
+            if state == 0 or text != last_text:
+                #
+                # A space is added to the completion since the Python
+                # readline doesn't do this on its own. When a word is
+                # fully completed we want to mimic the default readline
+                # library behavior of adding a space after it.
+                #
+                matches = [x + " " for x in vocabulary if x.startswith(text)]
+                last_text = text
 
             #
-            # A space is added to the completion since the Python readline
-            # doesn't do this on its own. When a word is fully completed we
-            # want to mimic the default readline library behavior of adding
-            # a space after it.
+            # None is returned for the end of the completion session.
             #
-            return results[state] + " "
+            if state < len(matches):
+                return matches[state]
+            return None
 
         return custom_complete
 
@@ -75,6 +89,13 @@ class REPL:
         readline.parse_and_bind("tab: complete")
 
     def enable_history(self, history_file: str) -> None:
+        #
+        # History is already enabled. Reading the file again and
+        # registering another atexit handler would only make us write
+        # the same history twice when we exit.
+        #
+        if self.histfile:
+            return
         self.histfile = os.path.expanduser(history_file)
         try:
             readline.read_history_file(self.histfile)
@@ -105,7 +126,13 @@ class REPL:
         # pylint: disable=broad-except
         try:
             for obj in invoke([], input_):
-                print(obj.format_(dereference=False))
+                #
+                # Write each object with a single call on the stream.
+                # Note that sys.stdout must be looked up every time, as
+                # invoke() points it to the shell process of a "!"
+                # pipeline only once the pipeline starts running.
+                #
+                sys.stdout.write(obj.format_(dereference=False) + "\n")
         except CommandArgumentsError:
             #
             # We skip printing anything for this specific error
@@ -59,7 +59,11 @@ def get_pointer_type(type_name: str) -> drgn.Type:
 
 
 def is_null(obj: drgn.Object) -> bool:
-    return bool(obj == drgn.NULL(prog, obj.type_))
+    #
+    # A pointer object is falsy exactly when it is NULL, so there is no
+    # need to construct a NULL object of the same type to compare with.
+    #
+    return not obj
 
 
 def create_object(type_: Union[str, drgn.Type], val: Any) -> drgn.Object:
@@ -37,6 +37,8 @@ CMD_TABLE = [
     "dbuf -l 1",
     "dbuf | dbuf -l 1",
     'dbuf | dbuf -l 1 | head | dbuf',
+    "dbuf | head 1 | member db_dnode_handle->dnh_dnode->dn_dbufs | dbuf -l 2",
+    "dbuf | head 1 | member db_dnode_handle->dnh_dnode->dn_dbufs | dbuf -l 99",
 
     # spa + vdev + metaslab
     "spa",
@@ -0,0 +1,62 @@
+#
+# Copyright 2019 Delphix
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+# pylint: disable=missing-docstring
+
+from typing import List
+
+import pytest
+
+from sdb.commands.zfs.histograms import ZFSHistogram
+
+#
+# The expected medians are the ones that the float-based implementation
+# of the median returned, which integer math must reproduce exactly.
+#
+MEDIAN_TABLE = [
+    # empty histogram
+    ([], 0, 0),
+
+    # all buckets are zero
+    ([0, 0, 0], 0, 0),
+    ([0, 0, 0, 0], 9, 0),
+
+    # the median falls in the last bucket
+    ([0, 0, 0, 5], 0, 6),
+    ([0, 0, 0, 0, 7], 9, 6144),
+    ([1, 0, 0, 0, 0, 0, 0, 0, 0, 1], 3, 3070),
+    ([0, 1, 0, 1], 0, 6),
+
+    # single bucket
+    ([5], 1, 1),
+
+    # the fill of the bucket rounds half to even
+    ([1, 1], 1, 2),
+    ([3, 0, 1], 1, 4),
+    ([1, 2, 3], 4, 41),
+
+    # the histogram from the zhist help message
+    ([
+        4359, 3328, 3800, 3536, 3983, 4876, 9138, 4508, 2783, 1952, 1218, 675,
+        486, 267, 110, 50, 18, 8, 11, 102
+    ], 9, 178100878),
+]
+
+
+@pytest.mark.parametrize(  # type: ignore[misc]
+    'counts,offset,expected', MEDIAN_TABLE)
+def test_counts_median(counts: List[int], offset: int, expected: int) -> None:
+    assert ZFSHistogram.counts_median(counts, offset) == expected
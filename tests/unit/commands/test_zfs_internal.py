@@ -0,0 +1,59 @@
+#
+# Copyright 2019 Delphix
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+# pylint: disable=missing-docstring
+
+import pytest
+
+from sdb.commands.zfs.internal import nicenum
+
+NICENUM_TABLE = [
+    (0, "0B"),
+    (1, "1B"),
+    (1023, "1023B"),
+    (1024, "1KB"),
+    (1025, "1KB"),
+    (2047, "1KB"),
+    (2048, "2KB"),
+    (1000000, "976KB"),
+    (2**20 - 1, "1023KB"),
+    (2**20, "1MB"),
+    (2**40 + 5, "1TB"),
+    (2**53 + 1, "8PB"),
+    (2**63, "8EB"),
+
+    #
+    # The loop that nicenum() replaced divided with floats, which
+    # rounded the values below up to the next unit (1EB and 16EB).
+    #
+    (2**60 - 1, "1023PB"),
+    (2**64 - 1, "15EB"),
+
+    # the loop returned an unformatted string for these
+    (2**80, "1YB"),
+    (2**90, "1024YB"),
+]
+
+
+@pytest.mark.parametrize(  # type: ignore[misc]
+    'num,expected', NICENUM_TABLE)
+def test_nicenum(num: int, expected: str) -> None:
+    assert nicenum(num) == expected
+
+
+def test_nicenum_suffix() -> None:
+    assert nicenum(1023, "") == "1023"
+    assert nicenum(2048, "/s") == "2K/s"
@@ -0,0 +1,89 @@
+#
+# Copyright 2020 Delphix
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+# pylint: disable=missing-docstring
+
+import os
+import pathlib
+import re
+from typing import List
+
+import pytest
+
+from sdb.internal.cli import find_debug_files
+
+DEBUG_FILES = [
+    "zfs.ko",
+    "libzpool.so",
+    "libzpool.so.2",
+    "libzpool.so.2.0",
+    "zdb.debug",
+    "mod/spl.ko",
+    "mod/deep/er/libnvpair.so.3",
+    "mod/deep/er/lib.so.debug",
+]
+
+OTHER_FILES = [
+    "README",
+    "zfs.ko.xz",
+    ".so",
+    "mod/deep/notes.txt",
+]
+
+
+def walk_debug_files(root: str, no_filter: bool) -> List[str]:
+    """
+    The os.walk() based search that find_debug_files() replaced.
+    """
+    kos = []
+    for (ppath, __, files) in os.walk(root):
+        for i in files:
+            if i.endswith(".ko") or i.endswith(".debug") or re.match(
+                    r".+\.so(\.\d)?", i) or no_filter:
+                kos.append(os.sep.join([ppath, i]))
+    return kos
+
+
+@pytest.fixture  # type: ignore[misc]
+def debug_tree(tmp_path: pathlib.Path) -> str:
+    for path in DEBUG_FILES + OTHER_FILES:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).touch()
+    (tmp_path / "empty").mkdir()
+    (tmp_path / "loop").symlink_to(tmp_path, target_is_directory=True)
+    return str(tmp_path)
+
+
+def test_filter(debug_tree: str) -> None:
+    # pylint: disable=redefined-outer-name
+    found = list(find_debug_files(debug_tree, False))
+
+    assert found == walk_debug_files(debug_tree, False)
+    assert sorted(found) == sorted(
+        os.path.join(debug_tree, path) for path in DEBUG_FILES)
+
+
+def test_no_filter(debug_tree: str) -> None:
+    # pylint: disable=redefined-outer-name
+    found = list(find_debug_files(debug_tree, True))
+
+    assert found == walk_debug_files(debug_tree, True)
+    assert sorted(found) == sorted(
+        os.path.join(debug_tree, path) for path in DEBUG_FILES + OTHER_FILES)
+
+
+def test_missing_root(tmp_path: pathlib.Path) -> None:
+    assert not list(find_debug_files(str(tmp_path / "missing"), False))
@@ -0,0 +1,84 @@
+#
+# Copyright 2020 Delphix
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+# pylint: disable=missing-docstring
+# pylint: disable=protected-access
+
+from typing import Callable, List, Optional
+
+from sdb.internal.repl import REPL
+
+VOCABULARY = ["spa", "spl_kmem_caches", "stacks", "sum", "vdev", "zio"]
+
+
+def make_completer(
+        vocabulary: List[str]) -> Callable[[str, int], Optional[str]]:
+    return REPL._REPL__make_completer(vocabulary)  # type: ignore
+
+
+def complete_all(completer: Callable[[str, int], Optional[str]],
+                 text: str) -> List[Optional[str]]:
+    """
+    Calls the completer the way readline does, with increasing states
+    until it returns None.
+    """
+    results = [completer(text, 0)]
+    while results[-1] is not None:
+        results.append(completer(text, len(results)))
+    return results
+
+
+def test_matches() -> None:
+    completer = make_completer(VOCABULARY)
+
+    assert complete_all(completer, "sp") == ["spa ", "spl_kmem_caches ", None]
+    assert complete_all(completer, "s") == [
+        "spa ", "spl_kmem_caches ", "stacks ", "sum ", None
+    ]
+    assert complete_all(completer, "zio") == ["zio ", None]
+
+
+def test_all_words() -> None:
+    completer = make_completer(VOCABULARY)
+
+    assert complete_all(completer, "") == [x + " " for x in VOCABULARY] + [None]
+
+
+def test_no_matches() -> None:
+    completer = make_completer(VOCABULARY)
+
+    assert completer("x", 0) is None
+    assert completer("spz", 0) is None
+
+
+def test_new_text_without_state_zero() -> None:
+    #
+    # The matches must be recomputed when the text changes, even if
+    # readline doesn't start over from state 0.
+    #
+    completer = make_completer(VOCABULARY)
+
+    assert completer("sp", 0) == "spa "
+    assert completer("st", 0) == "stacks "
+    assert completer("s", 3) == "sum "
+    assert completer("s", 4) is None
+
+
+def test_empty_vocabulary() -> None:
+    completer = make_completer([])
+
+    assert completer("", 0) is None
+    assert completer("spa", 0) is None